@@ -50,6 +50,7 @@ from pants.engine.process import Process, ProcessCacheScope, ProcessResult
 from pants.python.python_setup import InvalidLockfileBehavior
 from pants.testutil.rule_runner import QueryRule, RuleRunner
 from pants.util.dirutil import safe_rmtree
+from pants.util.memo import memoized
 from pants.util.ordered_set import FrozenOrderedSet
 
 
@@ -716,15 +717,7 @@ def _run_pex_for_lockfile_test(
     uses_project_ic=False,
 ) -> None:
 
-    (
-        actual_digest,
-        expected_digest,
-        actual_constraints,
-        expected_constraints,
-        actual_requirements,
-        expected_requirements,
-        options_scope_name,
-    ) = _metadata_validation_values(
+    values = _metadata_validation_values(
         invalid_reqs, invalid_constraints, uses_source_plugins, uses_project_ic
     )
 
@@ -732,9 +725,9 @@ def _run_pex_for_lockfile_test(
 # --- BEGIN PANTS LOCKFILE METADATA: DO NOT EDIT OR REMOVE ---
 # {{
 #   "version": 1,
-#   "requirements_invalidation_digest": "{actual_digest}",
+#   "requirements_invalidation_digest": "{values.actual_digest}",
 #   "valid_for_interpreter_constraints": [
-#     "{ actual_constraints }"
+#     "{ values.actual_constraints }"
 #   ]
 # }}
 # --- END PANTS LOCKFILE METADATA ---
@@ -745,16 +738,16 @@ ansicolors==1.1.8
         rule_runner,
         lockfile_type,
         lockfile,
-        expected_digest,
-        expected_requirements,
-        options_scope_name,
+        values.expected_digest,
+        values.expected_requirements,
+        values.options_scope_name,
         uses_source_plugins,
         uses_project_ic,
     )
 
     create_pex_and_get_all_data(
         rule_runner,
-        interpreter_constraints=InterpreterConstraints([expected_constraints]),
+        interpreter_constraints=InterpreterConstraints([values.expected_constraints]),
         requirements=requirements,
         additional_pants_args=(
             "--python-setup-experimental-lockfile=lockfile.txt",
@@ -763,6 +756,33 @@ ansicolors==1.1.8
     )
 
 
+class M:
+    opening_default = "You are using the `<default>` lockfile provided by Pants"
+    opening_file = "You are using the lockfile at"
+
+    invalid_requirements = (
+        "You have set different requirements than those used to generate the lockfile"
+    )
+    invalid_requirements_source_plugins = ".source_plugins`, and"
+
+    invalid_interpreter_constraints = "You have set interpreter constraints"
+    invalid_interpreter_constraints_tool_ics = (
+        ".interpreter_constraints`, or by using a new custom lockfile."
+    )
+    invalid_interpreter_constraints_project_ics = (
+        "determines its interpreter constraints based on your code's own constraints."
+    )
+
+    closing_lockfile_content = "To generate a custom lockfile based on your current configuration"
+    closing_file = "To regenerate your lockfile based on your current configuration"
+
+
+_EXPECTED_OPENING = {
+    DEFAULT: M.opening_default,
+    FILE: M.opening_file,
+}
+
+
 @pytest.mark.parametrize(
     "lockfile_type,invalid_reqs,invalid_constraints,uses_source_plugins,uses_project_ic,version",
     [
@@ -786,64 +806,34 @@ def test_validate_metadata(
     version,
     caplog,
 ) -> None:
-    class M:
-        opening_default = "You are using the `<default>` lockfile provided by Pants"
-        opening_file = "You are using the lockfile at"
-
-        invalid_requirements = (
-            "You have set different requirements than those used to generate the lockfile"
-        )
-        invalid_requirements_source_plugins = ".source_plugins`, and"
-
-        invalid_interpreter_constraints = "You have set interpreter constraints"
-        invalid_interpreter_constraints_tool_ics = (
-            ".interpreter_constraints`, or by using a new custom lockfile."
-        )
-        invalid_interpreter_constraints_project_ics = (
-            "determines its interpreter constraints based on your code's own constraints."
-        )
-
-        closing_lockfile_content = (
-            "To generate a custom lockfile based on your current configuration"
-        )
-        closing_file = "To regenerate your lockfile based on your current configuration"
-
-    (
-        actual_digest,
-        expected_digest,
-        actual_constraints,
-        expected_constraints,
-        actual_requirements,
-        expected_requirements_,
-        options_scope_name,
-    ) = _metadata_validation_values(
+    values = _metadata_validation_values(
         invalid_reqs, invalid_constraints, uses_source_plugins, uses_project_ic
     )
 
     metadata: LockfileMetadata
     if version == 1:
         metadata = LockfileMetadataV1(
-            InterpreterConstraints([expected_constraints]), expected_digest
+            InterpreterConstraints([values.expected_constraints]), values.expected_digest
         )
     elif version == 2:
-        expected_requirements = {Requirement.parse(i) for i in expected_requirements_}
+        expected_requirements = {Requirement.parse(i) for i in values.expected_requirements}
         metadata = LockfileMetadataV2(
-            InterpreterConstraints([expected_constraints]), expected_requirements
+            InterpreterConstraints([values.expected_constraints]), expected_requirements
         )
     requirements = _prepare_pex_requirements(
         rule_runner,
         lockfile_type,
         "lockfile_data_goes_here",
-        actual_digest,
-        actual_requirements,
-        options_scope_name,
+        values.actual_digest,
+        values.actual_requirements,
+        values.options_scope_name,
         uses_source_plugins,
         uses_project_ic,
     )
 
     request = MagicMock(
-        options_scope_name=options_scope_name,
-        interpreter_constraints=InterpreterConstraints([actual_constraints]),
+        options_scope_name=values.options_scope_name,
+        interpreter_constraints=InterpreterConstraints([values.actual_constraints]),
     )
     python_setup = MagicMock(
         invalid_lockfile_behavior=InvalidLockfileBehavior.warn,
@@ -854,42 +844,51 @@ def test_validate_metadata(
 
     txt = caplog.text.strip()
 
-    expected_opening = {
-        DEFAULT: M.opening_default,
-        FILE: M.opening_file,
-    }[lockfile_type]
+    expected_opening = _EXPECTED_OPENING[lockfile_type]
 
-    assert expected_opening in txt
+    present = {expected_opening}
+    absent: set[str] = set()
 
     if invalid_reqs:
-        assert M.invalid_requirements in txt
-        if uses_source_plugins:
-            assert M.invalid_requirements_source_plugins in txt
-        else:
-            assert M.invalid_requirements_source_plugins not in txt
+        present.add(M.invalid_requirements)
+        (present if uses_source_plugins else absent).add(M.invalid_requirements_source_plugins)
     else:
-        assert M.invalid_requirements not in txt
+        absent.add(M.invalid_requirements)
 
     if invalid_constraints:
-        assert M.invalid_interpreter_constraints in txt
+        present.add(M.invalid_interpreter_constraints)
         if uses_project_ic:
-            assert M.invalid_interpreter_constraints_project_ics in txt
-            assert M.invalid_interpreter_constraints_tool_ics not in txt
+            present.add(M.invalid_interpreter_constraints_project_ics)
+            absent.add(M.invalid_interpreter_constraints_tool_ics)
         else:
-            assert M.invalid_interpreter_constraints_project_ics not in txt
-            assert M.invalid_interpreter_constraints_tool_ics in txt
-
+            absent.add(M.invalid_interpreter_constraints_project_ics)
+            present.add(M.invalid_interpreter_constraints_tool_ics)
     else:
-        assert M.invalid_interpreter_constraints not in txt
+        absent.add(M.invalid_interpreter_constraints)
 
     if lockfile_type == FILE:
-        assert M.closing_lockfile_content not in txt
-        assert M.closing_file in txt
+        absent.add(M.closing_lockfile_content)
+        present.add(M.closing_file)
+
+    missing = [marker for marker in present if marker not in txt]
+    unexpected = [marker for marker in absent if marker in txt]
+    assert not missing and not unexpected, f"missing: {missing}, unexpected: {unexpected}"
+
+
+@dataclass(frozen=True)
+class MetadataValidationValues:
+    actual_digest: str
+    expected_digest: str
+    actual_constraints: str
+    expected_constraints: str
+    actual_requirements: set[str]
+    expected_requirements: set[str]
+    options_scope_name: str
 
 
 def _metadata_validation_values(
     invalid_reqs: bool, invalid_constraints: bool, uses_source_plugins: bool, uses_project_ic: bool
-) -> tuple[str, str, str, str, set[str], set[str], str]:
+) -> MetadataValidationValues:
 
     actual_digest = "900d"
     expected_digest = actual_digest
@@ -914,17 +913,27 @@ def _metadata_validation_values(
     else:
         options_scope_name = "kevin"
 
-    return (
-        actual_digest,
-        expected_digest,
-        actual_constraints,
-        expected_constraints,
-        actual_reqs,
-        expected_reqs,
-        options_scope_name,
+    return MetadataValidationValues(
+        actual_digest=actual_digest,
+        expected_digest=expected_digest,
+        actual_constraints=actual_constraints,
+        expected_constraints=expected_constraints,
+        actual_requirements=actual_reqs,
+        expected_requirements=expected_reqs,
+        options_scope_name=options_scope_name,
     )
 
 
+@memoized
+def _encoded_lockfile(lockfile: str) -> bytes:
+    return lockfile.encode("utf-8")
+
+
+@memoized
+def _frozen_requirements(requirements: frozenset[str]) -> FrozenOrderedSet[str]:
+    return FrozenOrderedSet(sorted(requirements))
+
+
 def _prepare_pex_requirements(
     rule_runner: RuleRunner,
     lockfile_type: str,
@@ -935,6 +944,7 @@ def _prepare_pex_requirements(
     uses_source_plugins: bool,
     uses_project_interpreter_constraints: bool,
 ) -> Lockfile | LockfileContent:
+    req_strings = _frozen_requirements(frozenset(expected_requirements))
     if lockfile_type == FILE:
         file_path = "lockfile.txt"
         rule_runner.write_files({file_path: lockfile})
@@ -942,17 +952,17 @@ def _prepare_pex_requirements(
             file_path=file_path,
             file_path_description_of_origin="iceland",
             lockfile_hex_digest=expected_digest,
-            req_strings=FrozenOrderedSet(expected_requirements),
+            req_strings=req_strings,
             options_scope_name=options_scope_name,
             uses_source_plugins=uses_source_plugins,
             uses_project_interpreter_constraints=uses_project_interpreter_constraints,
         )
     elif lockfile_type == DEFAULT:
-        content = FileContent("lockfile.txt", lockfile.encode("utf-8"))
+        content = FileContent("lockfile.txt", _encoded_lockfile(lockfile))
         return ToolDefaultLockfile(
             file_content=content,
             lockfile_hex_digest=expected_digest,
-            req_strings=FrozenOrderedSet(expected_requirements),
+            req_strings=req_strings,
             options_scope_name=options_scope_name,
             uses_source_plugins=uses_source_plugins,
             uses_project_interpreter_constraints=uses_project_interpreter_constraints,
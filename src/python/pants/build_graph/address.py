@@ -4,7 +4,7 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import PurePath
 from typing import Sequence
 
@@ -36,8 +36,17 @@ class AddressInput:
     path_component: str
     target_component: str | None = None
     generated_component: str | None = None
+    _hash: int = field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
+        # AddressInputs are hashed frequently by the engine, so we compute the hash eagerly rather
+        # than re-hashing the fields on every lookup.
+        object.__setattr__(
+            self,
+            "_hash",
+            hash((self.path_component, self.target_component, self.generated_component)),
+        )
+
         if self.target_component is not None or self.path_component == "":
             if not self.target_component:
                 raise InvalidTargetName(
@@ -116,29 +125,16 @@ class AddressInput:
             else None
         )
 
-        def prefix_subproject(spec_path: str) -> str:
-            if not subproject:
-                return spec_path
-            if spec_path:
-                return os.path.join(subproject, spec_path)
-            return os.path.normpath(subproject)
-
-        spec_parts = spec.split(":", maxsplit=1)
-        path_component = spec_parts[0]
-        if len(spec_parts) == 1:
-            target_component = None
-            generated_parts = path_component.split("#", maxsplit=1)
-            if len(generated_parts) == 1:
-                generated_component = None
-            else:
-                path_component, generated_component = generated_parts
+        # NB: This is called for every address in every BUILD file, so we use `str.partition`
+        # rather than `str.split` to avoid allocating intermediate lists.
+        target_component: str | None
+        path_component, target_sep, remainder = spec.partition(":")
+        if target_sep:
+            target_component, generated_sep, generated_name = remainder.partition("#")
         else:
-            generated_parts = spec_parts[1].split("#", maxsplit=1)
-            if len(generated_parts) == 1:
-                target_component = generated_parts[0]
-                generated_component = None
-            else:
-                target_component, generated_component = generated_parts
+            target_component = None
+            path_component, generated_sep, generated_name = path_component.partition("#")
+        generated_component = generated_name if generated_sep else None
 
         normalized_relative_to = None
         if relative_to:
@@ -150,10 +146,19 @@ class AddressInput:
         if not path_component and normalized_relative_to:
             path_component = normalized_relative_to
 
-        path_component = prefix_subproject(strip_prefix(path_component, "//"))
+        path_component = strip_prefix(path_component, "//")
+        if subproject:
+            path_component = (
+                os.path.join(subproject, path_component)
+                if path_component
+                else os.path.normpath(subproject)
+            )
 
         return cls(path_component, target_component, generated_component)
 
+    def __hash__(self) -> int:
+        return self._hash
+
     def file_to_address(self) -> Address:
         """Converts to an Address by assuming that the path_component is a file on disk."""
         if self.target_component is None:
@@ -377,10 +382,14 @@ class Address(EngineAwareParameter):
         return self
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Address):
             return False
+        # The hash is precomputed, so comparing it first cheaply rejects most unequal addresses.
         return (
-            self.spec_path == other.spec_path
+            self._hash == other._hash
+            and self.spec_path == other.spec_path
             and self._target_name == other._target_name
             and self.generated_name == other.generated_name
             and self._relative_file_path == other._relative_file_path
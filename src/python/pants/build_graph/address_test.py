@@ -7,6 +7,35 @@ import pytest
 
 from pants.build_graph.address import Address, AddressInput, InvalidSpecPath, InvalidTargetName
 
+BAD_PATH_COMPONENT_SPECS = (
+    "..",
+    ".",
+    "//..",
+    "//.",
+    "a/.",
+    "a/..",
+    "../a",
+    "a/../a",
+    "a/:a",
+    "a/b/:b",
+    "/a",
+    "///a",
+)
+BAD_TARGET_COMPONENT_SPECS = (
+    "",
+    "a:",
+    "a::",
+    "//",
+    "//:",
+    "//:@t",
+    "//:!t",
+    "//:?",
+    "//:=",
+    r"a:b\c",
+    "a:b/c",
+)
+BAD_GENERATED_NAME_SPECS = ("//:t#gen@", "//:t#gen!", "//:t#gen?", "//:t#gen=")
+
 
 def test_address_input_parse_spec() -> None:
     def assert_parsed(
@@ -81,24 +110,19 @@ def test_address_input_parse_spec() -> None:
     assert_parsed("a/b/c.txt#gen", path_component="a/b/c.txt", generated_component="gen")
 
 
-@pytest.mark.parametrize(
-    "spec",
-    ["..", ".", "//..", "//.", "a/.", "a/..", "../a", "a/../a", "a/:a", "a/b/:b", "/a", "///a"],
-)
+@pytest.mark.parametrize("spec", BAD_PATH_COMPONENT_SPECS)
 def test_address_input_parse_bad_path_component(spec: str) -> None:
     with pytest.raises(InvalidSpecPath):
         AddressInput.parse(spec)
 
 
-@pytest.mark.parametrize(
-    "spec", ["", "a:", "a::", "//", "//:", "//:@t", "//:!t", "//:?", "//:=", r"a:b\c", "a:b/c"]
-)
+@pytest.mark.parametrize("spec", BAD_TARGET_COMPONENT_SPECS)
 def test_address_bad_target_component(spec: str) -> None:
     with pytest.raises(InvalidTargetName):
         AddressInput.parse(spec).dir_to_address()
 
 
-@pytest.mark.parametrize("spec", ["//:t#gen@", "//:t#gen!", "//:t#gen?", "//:t#gen="])
+@pytest.mark.parametrize("spec", BAD_GENERATED_NAME_SPECS)
 def test_address_generated_name(spec: str) -> None:
     with pytest.raises(InvalidTargetName):
         AddressInput.parse(spec).dir_to_address()
@@ -10,7 +10,7 @@ from dataclasses import dataclass
 from typing import Optional, Tuple
 
 from pants.core.util_rules.distdir import DistDir
-from pants.engine.fs import Digest, MergeDigests, Snapshot, Workspace
+from pants.engine.fs import Digest, MergeDigests, Workspace
 from pants.engine.goal import Goal, GoalSubsystem
 from pants.engine.rules import Get, MultiGet, collect_rules, goal_rule
 from pants.engine.target import (
@@ -90,23 +90,30 @@ async def package_asset(workspace: Workspace, dist_dir: DistDir) -> Package:
             no_applicable_targets_behavior=NoApplicableTargetsBehavior.warn,
         ),
     )
-    if not target_roots_to_field_sets.field_sets:
+    field_sets = target_roots_to_field_sets.field_sets
+    if not field_sets:
         return Package(exit_code=0)
 
-    packages = await MultiGet(
-        Get(BuiltPackage, PackageFieldSet, field_set)
-        for field_set in target_roots_to_field_sets.field_sets
-    )
-    merged_snapshot = await Get(Snapshot, MergeDigests(pkg.digest for pkg in packages))
-    workspace.write_digest(merged_snapshot.digest, path_prefix=str(dist_dir.relpath))
+    if len(field_sets) == 1:
+        # Fast path for the common case of a single package: there's nothing to merge.
+        package = await Get(BuiltPackage, PackageFieldSet, field_sets[0])
+        packages: Tuple[BuiltPackage, ...] = (package,)
+        merged_digest = package.digest
+    else:
+        packages = await MultiGet(
+            Get(BuiltPackage, PackageFieldSet, field_set) for field_set in field_sets
+        )
+        merged_digest = await Get(Digest, MergeDigests(pkg.digest for pkg in packages))
+    dist_prefix = str(dist_dir.relpath)
+    workspace.write_digest(merged_digest, path_prefix=dist_prefix)
+    msg = []
     for pkg in packages:
         for artifact in pkg.artifacts:
-            msg = []
             if artifact.relpath:
-                msg.append(f"Wrote {dist_dir.relpath / artifact.relpath}")
+                msg.append(f"Wrote {os.path.join(dist_prefix, artifact.relpath)}")
             msg.extend(str(line) for line in artifact.extra_log_lines)
-            if msg:
-                logger.info("\n".join(msg))
+    if msg:
+        logger.info("\n".join(msg))
     return Package(exit_code=0)
 
 
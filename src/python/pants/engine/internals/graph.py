@@ -978,16 +978,16 @@ class NoApplicableTargetsException(Exception):
         inapplicable_target_aliases = sorted({tgt.alias for tgt in targets})
         bulleted_list_sep = "\n  * "
 
-        msg = (
-            "No applicable files or targets matched."
-            if inapplicable_target_aliases
-            else "No files or targets specified."
-        )
-        msg += (
-            f" {goal_description.capitalize()} works "
-            f"with these target types:\n{bulleted_list_sep}"
-            f"{bulleted_list_sep.join(applicable_target_aliases)}\n\n"
-        )
+        # Collect the parts of the message and join them once at the end.
+        msg = [
+            (
+                "No applicable files or targets matched."
+                if inapplicable_target_aliases
+                else "No files or targets specified."
+            ),
+            f" {goal_description.capitalize()} works with these target types:\n",
+            f"{bulleted_list_sep}{bulleted_list_sep.join(applicable_target_aliases)}\n\n",
+        ]
 
         # Explain what was specified, if relevant.
         if inapplicable_target_aliases:
@@ -999,8 +999,8 @@ class NoApplicableTargetsException(Exception):
                 specs_description = " targets with "
             else:
                 specs_description = " "
-            msg += (
-                f"However, you only specified{specs_description}these target types:\n"
+            msg.append(f"However, you only specified{specs_description}these target types:\n")
+            msg.append(
                 f"{bulleted_list_sep}{bulleted_list_sep.join(inapplicable_target_aliases)}\n\n"
             )
 
@@ -1018,19 +1018,18 @@ class NoApplicableTargetsException(Exception):
         pants_filter_command = (
             f"./pants filter --target-type={','.join(applicable_target_aliases)} ::"
         )
-        remedy = (
+        msg.append(
             f"Please specify relevant files and/or targets. Run `{pants_filter_command}` to "
             "find all applicable targets in your project"
         )
         if filedeps_goal_works:
-            remedy += (
+            msg.append(
                 f", or run `{pants_filter_command} | xargs ./pants filedeps` to find all "
                 "applicable files."
             )
         else:
-            remedy += "."
-        msg += remedy
-        super().__init__(msg)
+            msg.append(".")
+        super().__init__("".join(msg))
 
     @classmethod
     def create_from_field_sets(
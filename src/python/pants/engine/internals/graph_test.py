@@ -1,15 +1,17 @@
 # Copyright 2020 Pants project contributors (see CONTRIBUTORS.md).
 # Licensed under the Apache License, Version 2.0 (see LICENSE).
 
-import itertools
 import os.path
+import re
+from collections import Counter
 from dataclasses import dataclass
 from pathlib import PurePath
 from textwrap import dedent
-from typing import Iterable, List, Set, Tuple, Type, cast
+from typing import FrozenSet, Iterable, List, Mapping, Tuple, Type, Union, cast
 
 import pytest
 
+from pants.base.build_root import BuildRoot
 from pants.base.specs import (
     AddressLiteralSpec,
     AddressSpecs,
@@ -72,11 +74,14 @@ from pants.engine.target import (
     Targets,
     TransitiveTargets,
     TransitiveTargetsRequest,
+    UnexpandedTargets,
     generate_file_level_targets,
 )
 from pants.engine.unions import UnionMembership, UnionRule, union
 from pants.source.filespec import Filespec
 from pants.testutil.rule_runner import QueryRule, RuleRunner
+from pants.util.dirutil import safe_rmtree
+from pants.util.memo import memoized
 from pants.util.ordered_set import FrozenOrderedSet
 
 
@@ -113,12 +118,38 @@ class MockGenerateTargetsRequest(GenerateTargetsRequest):
 
 @rule
 async def generate_mock_generated_target(request: MockGenerateTargetsRequest) -> GeneratedTargets:
-    paths = await Get(SourcesPaths, SourcesPathsRequest(request.generator[Sources]))
+    sources_field = request.generator[Sources]
+    if not sources_field.value:
+        # Without any `sources`, there are no files to generate targets for.
+        return GeneratedTargets(request.generator, ())
+    paths = await Get(SourcesPaths, SourcesPathsRequest(sources_field))
     return generate_file_level_targets(MockGeneratedTarget, request.generator, paths.files, None)
 
 
-@pytest.fixture
-def transitive_targets_rule_runner() -> RuleRunner:
+def reset_rule_runner(rule_runner: RuleRunner) -> RuleRunner:
+    """Restore a RuleRunner shared by several tests to a clean build root and default options.
+
+    Constructing a RuleRunner dominates the cost of these tests, so fixtures build one per module
+    and reset it between tests rather than starting a new engine for each test.
+    """
+    for entry in os.listdir(rule_runner.build_root):
+        path = os.path.join(rule_runner.build_root, entry)
+        if path == rule_runner.pants_workdir:
+            continue
+        if os.path.isdir(path):
+            safe_rmtree(path)
+        else:
+            os.unlink(path)
+    rule_runner.scheduler.invalidate_all_files()
+    # Other RuleRunners may have been constructed since, which would change the build root used
+    # when parsing options.
+    BuildRoot().path = rule_runner.build_root
+    rule_runner.set_options([])
+    return rule_runner
+
+
+@pytest.fixture(scope="module")
+def _transitive_targets_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             generate_mock_generated_target,
@@ -126,36 +157,48 @@ def transitive_targets_rule_runner() -> RuleRunner:
             QueryRule(CoarsenedTargets, [Addresses]),
             QueryRule(Targets, [DependenciesRequest]),
             QueryRule(TransitiveTargets, [TransitiveTargetsRequest]),
+            QueryRule(UnexpandedTargets, [Addresses]),
         ],
         target_types=[MockTarget, MockTargetGenerator, MockGeneratedTarget],
     )
 
 
-def test_transitive_targets(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='t1')
-                target(name='t2', dependencies=[':t1'])
-                target(name='d1', dependencies=[':t1'])
-                target(name='d2', dependencies=[':t2'])
-                target(name='d3')
-                target(name='root', dependencies=[':d1', ':d2', ':d3'])
-                """
-            ),
-        }
+@pytest.fixture
+def transitive_targets_rule_runner(_transitive_targets_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_transitive_targets_rule_runner)
+
+
+@memoized
+def root_address(target_name: str) -> Address:
+    """The address of a target in the root BUILD file, shared between tests."""
+    return Address("", target_name=target_name)
+
+
+def get_targets(rule_runner: RuleRunner, *target_names: str) -> UnexpandedTargets:
+    """Resolve the targets with these names in the root BUILD file using a single request."""
+    return rule_runner.request(
+        UnexpandedTargets, [Addresses(root_address(name) for name in target_names)]
     )
 
-    def get_target(name: str) -> Target:
-        return transitive_targets_rule_runner.get_target(Address("", target_name=name))
 
-    t1 = get_target("t1")
-    t2 = get_target("t2")
-    d1 = get_target("d1")
-    d2 = get_target("d2")
-    d3 = get_target("d3")
-    root = get_target("root")
+TRANSITIVE_TARGETS_BUILD = dedent(
+    """\
+    target(name='t1')
+    target(name='t2', dependencies=[':t1'])
+    target(name='d1', dependencies=[':t1'])
+    target(name='d2', dependencies=[':t2'])
+    target(name='d3')
+    target(name='root', dependencies=[':d1', ':d2', ':d3'])
+    """
+)
+
+
+def test_transitive_targets(transitive_targets_rule_runner: RuleRunner) -> None:
+    transitive_targets_rule_runner.write_files({"BUILD": TRANSITIVE_TARGETS_BUILD})
+
+    t1, t2, d1, d2, d3, root = get_targets(
+        transitive_targets_rule_runner, "t1", "t2", "d1", "d2", "d3", "root"
+    )
 
     direct_deps = transitive_targets_rule_runner.request(
         Targets, [DependenciesRequest(root[Dependencies])]
@@ -163,7 +206,7 @@ def test_transitive_targets(transitive_targets_rule_runner: RuleRunner) -> None:
     assert direct_deps == Targets([d1, d2, d3])
 
     transitive_targets = transitive_targets_rule_runner.request(
-        TransitiveTargets, [TransitiveTargetsRequest([root.address, d2.address])]
+        TransitiveTargets, [TransitiveTargetsRequest((root.address, d2.address))]
     )
     assert transitive_targets.roots == (root, d2)
     # NB: `//:d2` is both a target root and a dependency of `//:root`.
@@ -171,25 +214,38 @@ def test_transitive_targets(transitive_targets_rule_runner: RuleRunner) -> None:
     assert transitive_targets.closure == FrozenOrderedSet([root, d2, d1, d3, t2, t1])
 
 
-def test_transitive_targets_transitive_exclude(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='base')
-                target(name='intermediate', dependencies=[':base'])
-                target(name='root', dependencies=[':intermediate', '!!:base'])
-                """
-            ),
-        }
-    )
+TRANSITIVE_EXCLUDE_BUILD = dedent(
+    """\
+    target(name='base')
+    target(name='intermediate', dependencies=[':base'])
+    target(name='root', dependencies=[':intermediate', '!!:base'])
+    """
+)
+
+# A chain of targets `t1 <- t2 <- ... <- tN`, where the last target transitively excludes `t1` and
+# `t5`.
+NESTED_TRANSITIVE_EXCLUDE_CHAIN_LENGTH = 15
+NESTED_TRANSITIVE_EXCLUDE_BUILD = "\n".join(
+    [
+        "target(name='t1')",
+        *(
+            f"target(name='t{i}', dependencies=[':t{i - 1}'])"
+            for i in range(2, NESTED_TRANSITIVE_EXCLUDE_CHAIN_LENGTH)
+        ),
+        (
+            f"target(name='t{NESTED_TRANSITIVE_EXCLUDE_CHAIN_LENGTH}', "
+            f"dependencies=[':t{NESTED_TRANSITIVE_EXCLUDE_CHAIN_LENGTH - 1}', '!!:t1', '!!:t5'])"
+        ),
+    ]
+)
 
-    def get_target(name: str) -> Target:
-        return transitive_targets_rule_runner.get_target(Address("", target_name=name))
 
-    base = get_target("base")
-    intermediate = get_target("intermediate")
-    root = get_target("root")
+def test_transitive_targets_transitive_exclude(transitive_targets_rule_runner: RuleRunner) -> None:
+    transitive_targets_rule_runner.write_files({"BUILD": TRANSITIVE_EXCLUDE_BUILD})
+
+    base, intermediate, root = get_targets(
+        transitive_targets_rule_runner, "base", "intermediate", "root"
+    )
 
     intermediate_direct_deps = transitive_targets_rule_runner.request(
         Targets, [DependenciesRequest(intermediate[Dependencies])]
@@ -197,55 +253,37 @@ def test_transitive_targets_transitive_exclude(transitive_targets_rule_runner: R
     assert intermediate_direct_deps == Targets([base])
 
     transitive_targets = transitive_targets_rule_runner.request(
-        TransitiveTargets, [TransitiveTargetsRequest([root.address, intermediate.address])]
+        TransitiveTargets, [TransitiveTargetsRequest((root.address, intermediate.address))]
     )
     assert transitive_targets.roots == (root, intermediate)
-    assert transitive_targets.dependencies == FrozenOrderedSet([intermediate])
+    assert set(transitive_targets.dependencies) == {intermediate}
     assert transitive_targets.closure == FrozenOrderedSet([root, intermediate])
 
     # Regression test that we work with deeply nested levels of excludes.
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='t1')
-                target(name='t2', dependencies=[':t1'])
-                target(name='t3', dependencies=[':t2'])
-                target(name='t4', dependencies=[':t3'])
-                target(name='t5', dependencies=[':t4'])
-                target(name='t6', dependencies=[':t5'])
-                target(name='t7', dependencies=[':t6'])
-                target(name='t8', dependencies=[':t7'])
-                target(name='t9', dependencies=[':t8'])
-                target(name='t10', dependencies=[':t9'])
-                target(name='t11', dependencies=[':t10'])
-                target(name='t12', dependencies=[':t11'])
-                target(name='t13', dependencies=[':t12'])
-                target(name='t14', dependencies=[':t13'])
-                target(name='t15', dependencies=[':t14', '!!:t1', '!!:t5'])
-                """
-            ),
-        }
+    transitive_targets_rule_runner.write_files({"BUILD": NESTED_TRANSITIVE_EXCLUDE_BUILD})
+    chain = get_targets(
+        transitive_targets_rule_runner,
+        *(f"t{i}" for i in range(1, NESTED_TRANSITIVE_EXCLUDE_CHAIN_LENGTH + 1)),
     )
     transitive_targets = transitive_targets_rule_runner.request(
-        TransitiveTargets, [TransitiveTargetsRequest([get_target("t15").address])]
-    )
-    assert transitive_targets.dependencies == FrozenOrderedSet(
-        [
-            get_target("t14"),
-            get_target("t13"),
-            get_target("t12"),
-            get_target("t11"),
-            get_target("t10"),
-            get_target("t9"),
-            get_target("t8"),
-            get_target("t7"),
-            get_target("t6"),
-            get_target("t4"),
-            get_target("t3"),
-            get_target("t2"),
-        ]
+        TransitiveTargets, [TransitiveTargetsRequest((chain[-1].address,))]
     )
+    # Only which targets get excluded matters here, not the traversal order.
+    assert set(transitive_targets.dependencies) == {
+        tgt for tgt in chain[:-1] if tgt.address.target_name not in ("t1", "t5")
+    }
+
+
+SPECIAL_CASED_DEPENDENCIES_BUILD = dedent(
+    """\
+    target(name='t1')
+    target(name='t2', special_cased_deps1=[':t1'])
+    target(name='d1', special_cased_deps1=[':t1'])
+    target(name='d2', special_cased_deps2=[':t2'])
+    target(name='d3')
+    target(name='root', special_cased_deps1=[':d1', ':d2'], special_cased_deps2=[':d3'])
+    """
+)
 
 
 def test_special_cased_dependencies(transitive_targets_rule_runner: RuleRunner) -> None:
@@ -255,30 +293,11 @@ def test_special_cased_dependencies(transitive_targets_rule_runner: RuleRunner)
     This uses the same test setup as `test_transitive_targets`, but does not use the `dependencies`
     field like normal.
     """
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='t1')
-                target(name='t2', special_cased_deps1=[':t1'])
-                target(name='d1', special_cased_deps1=[':t1'])
-                target(name='d2', special_cased_deps2=[':t2'])
-                target(name='d3')
-                target(name='root', special_cased_deps1=[':d1', ':d2'], special_cased_deps2=[':d3'])
-                """
-            ),
-        }
-    )
-
-    def get_target(name: str) -> Target:
-        return transitive_targets_rule_runner.get_target(Address("", target_name=name))
+    transitive_targets_rule_runner.write_files({"BUILD": SPECIAL_CASED_DEPENDENCIES_BUILD})
 
-    t1 = get_target("t1")
-    t2 = get_target("t2")
-    d1 = get_target("d1")
-    d2 = get_target("d2")
-    d3 = get_target("d3")
-    root = get_target("root")
+    t1, t2, d1, d2, d3, root = get_targets(
+        transitive_targets_rule_runner, "t1", "t2", "d1", "d2", "d3", "root"
+    )
 
     direct_deps = transitive_targets_rule_runner.request(
         Targets, [DependenciesRequest(root[Dependencies])]
@@ -291,21 +310,32 @@ def test_special_cased_dependencies(transitive_targets_rule_runner: RuleRunner)
     assert direct_deps == Targets([d1, d2, d3])
 
     transitive_targets = transitive_targets_rule_runner.request(
-        TransitiveTargets, [TransitiveTargetsRequest([root.address, d2.address])]
+        TransitiveTargets, [TransitiveTargetsRequest((root.address, d2.address))]
     )
     assert transitive_targets.roots == (root, d2)
-    assert transitive_targets.dependencies == FrozenOrderedSet()
+    assert not transitive_targets.dependencies
     assert transitive_targets.closure == FrozenOrderedSet([root, d2])
 
     transitive_targets = transitive_targets_rule_runner.request(
         TransitiveTargets,
-        [TransitiveTargetsRequest([root.address, d2.address], include_special_cased_deps=True)],
+        [TransitiveTargetsRequest((root.address, d2.address), include_special_cased_deps=True)],
     )
     assert transitive_targets.roots == (root, d2)
     assert transitive_targets.dependencies == FrozenOrderedSet([d1, d2, d3, t2, t1])
     assert transitive_targets.closure == FrozenOrderedSet([root, d2, d1, d3, t2, t1])
 
 
+# Cycles are only tolerated for file-level targets like `python_source`.
+# TODO(#12871): Stop relying on only generated targets having cycle tolerance.
+GENERATED_TARGET_CYCLE_BUILD = dedent(
+    """\
+    generator(name='dep', sources=['dep.txt'])
+    generator(name='t1', sources=['t1.txt'], dependencies=['dep.txt:dep', 't2.txt:t2'])
+    generator(name='t2', sources=['t2.txt'], dependencies=['t1.txt:t1'])
+    """
+)
+
+
 # TODO(#12871): Fix this to not be based on generated targets.
 def test_transitive_targets_tolerates_generated_target_cycles(
     transitive_targets_rule_runner: RuleRunner,
@@ -313,22 +343,11 @@ def test_transitive_targets_tolerates_generated_target_cycles(
     """For certain file-level targets like `python_source`, we should tolerate cycles because the
     underlying language tolerates them."""
     transitive_targets_rule_runner.write_files(
-        {
-            "dep.txt": "",
-            "t1.txt": "",
-            "t2.txt": "",
-            "BUILD": dedent(
-                """\
-                generator(name='dep', sources=['dep.txt'])
-                generator(name='t1', sources=['t1.txt'], dependencies=['dep.txt:dep', 't2.txt:t2'])
-                generator(name='t2', sources=['t2.txt'], dependencies=['t1.txt:t1'])
-                """
-            ),
-        }
+        {"dep.txt": "", "t1.txt": "", "t2.txt": "", "BUILD": GENERATED_TARGET_CYCLE_BUILD}
     )
     result = transitive_targets_rule_runner.request(
         TransitiveTargets,
-        [TransitiveTargetsRequest([Address("", target_name="t2")])],
+        [TransitiveTargetsRequest((Address("", target_name="t2"),))],
     )
     assert len(result.roots) == 1
     assert result.roots[0].address == Address("", relative_file_path="t2.txt", target_name="t2")
@@ -342,20 +361,7 @@ def test_transitive_targets_tolerates_generated_target_cycles(
 def test_coarsened_targets(transitive_targets_rule_runner: RuleRunner) -> None:
     """CoarsenedTargets should "coarsen" a cycle into a single CoarsenedTarget instance."""
     transitive_targets_rule_runner.write_files(
-        {
-            "dep.txt": "",
-            "t1.txt": "",
-            "t2.txt": "",
-            # Cycles are only tolerated for file-level targets like `python_source`.
-            # TODO(#12871): Stop relying on only generated targets having cycle tolerance.
-            "BUILD": dedent(
-                """\
-                generator(name='dep', sources=['dep.txt'])
-                generator(name='t1', sources=['t1.txt'], dependencies=['dep.txt:dep', 't2.txt:t2'])
-                generator(name='t2', sources=['t2.txt'], dependencies=['t1.txt:t1'])
-                """
-            ),
-        }
+        {"dep.txt": "", "t1.txt": "", "t2.txt": "", "BUILD": GENERATED_TARGET_CYCLE_BUILD}
     )
 
     def assert_coarsened(
@@ -365,8 +371,8 @@ def test_coarsened_targets(transitive_targets_rule_runner: RuleRunner) -> None:
             CoarsenedTargets,
             [Addresses([a])],
         )
-        assert list(sorted(t.address for t in coarsened_targets[0].members)) == expected_members
-        assert list(sorted(d for d in coarsened_targets[0].dependencies)) == expected_dependencies
+        assert {t.address for t in coarsened_targets[0].members} == set(expected_members)
+        assert set(coarsened_targets[0].dependencies) == set(expected_dependencies)
 
     # Non-file-level targets are already validated to not have cycles, so they coarsen to
     # themselves.
@@ -428,91 +434,74 @@ def assert_failed_cycle(
     with pytest.raises(ExecutionError) as e:
         rule_runner.request(
             TransitiveTargets,
-            [TransitiveTargetsRequest([Address("", target_name=root_target_name)])],
+            [TransitiveTargetsRequest((root_address(root_target_name),))],
         )
     (cycle_exception,) = e.value.wrapped_exceptions
     assert isinstance(cycle_exception, CycleException)
-    assert cycle_exception.subject == Address("", target_name=subject_target_name)
-    assert cycle_exception.path == tuple(Address("", target_name=p) for p in path_target_names)
+    assert cycle_exception.subject == root_address(subject_target_name)
+    assert cycle_exception.path == tuple(root_address(p) for p in path_target_names)
 
 
-def test_dep_cycle_self(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files({"BUILD": "target(name='t1', dependencies=[':t1'])"})
-    assert_failed_cycle(
-        transitive_targets_rule_runner,
-        root_target_name="t1",
-        subject_target_name="t1",
-        path_target_names=("t1", "t1"),
-    )
+DEP_CYCLE_SELF_BUILD = "target(name='t1', dependencies=[':t1'])"
 
+DEP_CYCLE_DIRECT_BUILD = dedent(
+    """\
+    target(name='t1', dependencies=[':t2'])
+    target(name='t2', dependencies=[':t1'])
+    """
+)
 
-def test_dep_cycle_direct(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='t1', dependencies=[':t2'])
-                target(name='t2', dependencies=[':t1'])
-                """
-            )
-        }
-    )
-    assert_failed_cycle(
-        transitive_targets_rule_runner,
-        root_target_name="t1",
-        subject_target_name="t1",
-        path_target_names=("t1", "t2", "t1"),
-    )
-    assert_failed_cycle(
-        transitive_targets_rule_runner,
-        root_target_name="t2",
-        subject_target_name="t2",
-        path_target_names=("t2", "t1", "t2"),
-    )
+DEP_CYCLE_INDIRECT_BUILD = dedent(
+    """\
+    target(name='t1', dependencies=[':t2'])
+    target(name='t2', dependencies=[':t3'])
+    target(name='t3', dependencies=[':t2'])
+    """
+)
 
 
-def test_dep_cycle_indirect(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                target(name='t1', dependencies=[':t2'])
-                target(name='t2', dependencies=[':t3'])
-                target(name='t3', dependencies=[':t2'])
-                """
-            )
-        }
-    )
-    assert_failed_cycle(
-        transitive_targets_rule_runner,
-        root_target_name="t1",
-        subject_target_name="t2",
-        path_target_names=("t1", "t2", "t3", "t2"),
-    )
+@pytest.mark.parametrize(
+    "build_file,root_target_name,subject_target_name,path_target_names",
+    [
+        pytest.param(DEP_CYCLE_SELF_BUILD, "t1", "t1", ("t1", "t1"), id="self"),
+        pytest.param(DEP_CYCLE_DIRECT_BUILD, "t1", "t1", ("t1", "t2", "t1"), id="direct_t1"),
+        pytest.param(DEP_CYCLE_DIRECT_BUILD, "t2", "t2", ("t2", "t1", "t2"), id="direct_t2"),
+        pytest.param(
+            DEP_CYCLE_INDIRECT_BUILD, "t1", "t2", ("t1", "t2", "t3", "t2"), id="indirect_t1"
+        ),
+        pytest.param(DEP_CYCLE_INDIRECT_BUILD, "t2", "t2", ("t2", "t3", "t2"), id="indirect_t2"),
+    ],
+)
+def test_dep_cycle(
+    transitive_targets_rule_runner: RuleRunner,
+    build_file: str,
+    root_target_name: str,
+    subject_target_name: str,
+    path_target_names: Tuple[str, ...],
+) -> None:
+    transitive_targets_rule_runner.write_files({"BUILD": build_file})
     assert_failed_cycle(
         transitive_targets_rule_runner,
-        root_target_name="t2",
-        subject_target_name="t2",
-        path_target_names=("t2", "t3", "t2"),
+        root_target_name=root_target_name,
+        subject_target_name=subject_target_name,
+        path_target_names=path_target_names,
     )
 
 
+# TODO(#12871): Stop relying on only generated targets having cycle tolerance.
+DEP_NO_CYCLE_INDIRECT_BUILD = dedent(
+    """\
+    generator(name='t1', dependencies=['t2.txt:t2'])
+    generator(name='t2', dependencies=[':t1'], sources=['t2.txt'])
+    """
+)
+
+
 def test_dep_no_cycle_indirect(transitive_targets_rule_runner: RuleRunner) -> None:
-    transitive_targets_rule_runner.write_files(
-        {
-            "t2.txt": "",
-            # TODO(#12871): Stop relying on only generated targets having cycle tolerance.
-            "BUILD": dedent(
-                """\
-                generator(name='t1', dependencies=['t2.txt:t2'])
-                generator(name='t2', dependencies=[':t1'], sources=['t2.txt'])
-                """
-            ),
-        }
-    )
+    transitive_targets_rule_runner.write_files({"t2.txt": "", "BUILD": DEP_NO_CYCLE_INDIRECT_BUILD})
     result = transitive_targets_rule_runner.request(
         TransitiveTargets,
-        [TransitiveTargetsRequest([Address("", target_name="t1")])],
+        [TransitiveTargetsRequest((Address("", target_name="t1"),))],
     )
     print(result)
     assert len(result.roots) == 1
@@ -523,6 +512,14 @@ def test_dep_no_cycle_indirect(transitive_targets_rule_runner: RuleRunner) -> No
     }
 
 
+RESOLVE_GENERATED_TARGET_BUILD = dedent(
+    """\
+    generator(name='generator', sources=['f1.txt', 'f2.txt'])
+    target(name='non-generator', sources=['f1.txt'])
+    """
+)
+
+
 def test_resolve_generated_target(transitive_targets_rule_runner: RuleRunner) -> None:
     transitive_targets_rule_runner.write_files(
         {
@@ -530,12 +527,7 @@ def test_resolve_generated_target(transitive_targets_rule_runner: RuleRunner) ->
             "f2.txt": "",
             "f3.txt": "",
             "no_owner.txt": "",
-            "BUILD": dedent(
-                """\
-                generator(name='generator', sources=['f1.txt', 'f2.txt'])
-                target(name='non-generator', sources=['f1.txt'])
-                """
-            ),
+            "BUILD": RESOLVE_GENERATED_TARGET_BUILD,
         }
     )
     generated_target_address = Address("", target_name="generator", relative_file_path="f1.txt")
@@ -554,12 +546,23 @@ def test_resolve_generated_target(transitive_targets_rule_runner: RuleRunner) ->
     non_generator_file_address = Address(
         "", target_name="non-generator", relative_file_path="f1.txt"
     )
+    non_generator_address = non_generator_file_address.maybe_convert_to_target_generator()
     assert transitive_targets_rule_runner.get_target(non_generator_file_address) == MockTarget(
-        {Sources.alias: ["f1.txt"]}, non_generator_file_address.maybe_convert_to_target_generator()
+        {Sources.alias: ["f1.txt"]}, non_generator_address
     )
 
 
-def test_resolve_specs_snapshot() -> None:
+@memoized
+def specs_parser(build_root: str) -> SpecsParser:
+    """Return a SpecsParser for the build root, reused across the tests sharing a RuleRunner."""
+    return SpecsParser(build_root)
+
+
+# The empty source files that the `demo` BUILD files in several tests below own.
+DEMO_FILES = {"demo/f1.txt": "", "demo/f2.txt": ""}
+
+
+def test_resolve_specs_snapshot(specs_rule_runner: RuleRunner) -> None:
     """This tests that convert filesystem specs and/or address specs into a single snapshot.
 
     Some important edge cases:
@@ -568,14 +571,11 @@ def test_resolve_specs_snapshot() -> None:
     - If a file is covered both by an address spec and by a filesystem spec, we should merge it
       so that the file only shows up once.
     """
-    rule_runner = RuleRunner(rules=[QueryRule(SpecsSnapshot, (Specs,))], target_types=[MockTarget])
-    rule_runner.write_files(
-        {"demo/f1.txt": "", "demo/f2.txt": "", "demo/BUILD": "target(sources=['*.txt'])"}
-    )
-    specs = SpecsParser(rule_runner.build_root).parse_specs(
+    specs_rule_runner.write_files({**DEMO_FILES, "demo/BUILD": "target(sources=['*.txt'])"})
+    specs = specs_parser(specs_rule_runner.build_root).parse_specs(
         ["demo:demo", "demo/f1.txt", "demo/BUILD"]
     )
-    result = rule_runner.request(SpecsSnapshot, [specs])
+    result = specs_rule_runner.request(SpecsSnapshot, [specs])
     assert result.snapshot.files == ("demo/BUILD", "demo/f1.txt", "demo/f2.txt")
 
 
@@ -593,8 +593,8 @@ class MockSecondaryOwnerTarget(Target):
     core_fields = (MockSecondaryOwnerField,)
 
 
-@pytest.fixture
-def owners_rule_runner() -> RuleRunner:
+@pytest.fixture(scope="module")
+def _owners_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             generate_mock_generated_target,
@@ -610,11 +610,34 @@ def owners_rule_runner() -> RuleRunner:
     )
 
 
+@pytest.fixture
+def owners_rule_runner(_owners_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_owners_rule_runner)
+
+
+# Addresses shared by several of the owners and specs tests below.
+DEMO_GENERATOR = Address("demo", target_name="generator")
+DEMO_GENERATED_F = Address("demo", target_name="generator", relative_file_path="f.txt")
+DEMO_GENERATED_F1 = Address("demo", target_name="generator", relative_file_path="f1.txt")
+DEMO_GENERATED_F2 = Address("demo", target_name="generator", relative_file_path="f2.txt")
+DEMO_NOT_GENERATOR = Address("demo", target_name="not-generator")
+DEMO_SECONDARY = Address("demo", target_name="secondary")
+
+
 def assert_owners(
-    rule_runner: RuleRunner, requested: Iterable[str], *, expected: Set[Address]
+    rule_runner: RuleRunner, requested: Iterable[str], *, expected: FrozenSet[Address]
 ) -> None:
     result = rule_runner.request(Owners, [OwnersRequest(tuple(requested))])
-    assert set(result) == expected
+    assert frozenset(result) == expected
+
+
+OWNERS_SOURCE_FILE_DOES_NOT_EXIST_BUILD = dedent(
+    """\
+    target(name='not-generator', sources=['*.txt'])
+    generator(name='generator', sources=['*.txt'])
+    secondary_owner(name='secondary', secondary_owner_field='deleted.txt')
+    """
+)
 
 
 def test_owners_source_file_does_not_exist(owners_rule_runner: RuleRunner) -> None:
@@ -626,33 +649,31 @@ def test_owners_source_file_does_not_exist(owners_rule_runner: RuleRunner) -> No
     owners_rule_runner.write_files(
         {
             "demo/f.txt": "",
-            "demo/BUILD": dedent(
-                """\
-                target(name='not-generator', sources=['*.txt'])
-                generator(name='generator', sources=['*.txt'])
-                secondary_owner(name='secondary', secondary_owner_field='deleted.txt')
-                """
-            ),
+            "demo/BUILD": OWNERS_SOURCE_FILE_DOES_NOT_EXIST_BUILD,
         }
     )
     assert_owners(
         owners_rule_runner,
         ["demo/deleted.txt"],
-        expected={
-            Address("demo", target_name="generator"),
-            Address("demo", target_name="not-generator"),
-            Address("demo", target_name="secondary"),
-        },
+        expected=frozenset(
+            {
+                DEMO_GENERATOR,
+                DEMO_NOT_GENERATOR,
+                DEMO_SECONDARY,
+            }
+        ),
     )
 
     # For files that do exist, we should use generated targets when possible.
     assert_owners(
         owners_rule_runner,
         ["demo/f.txt"],
-        expected={
-            Address("demo", target_name="generator", relative_file_path="f.txt"),
-            Address("demo", target_name="not-generator"),
-        },
+        expected=frozenset(
+            {
+                DEMO_GENERATED_F,
+                DEMO_NOT_GENERATOR,
+            }
+        ),
     )
 
     # If another generated target comes from the same target generator, then both that generated
@@ -660,96 +681,104 @@ def test_owners_source_file_does_not_exist(owners_rule_runner: RuleRunner) -> No
     assert_owners(
         owners_rule_runner,
         ["demo/f.txt", "demo/deleted.txt"],
-        expected={
-            Address("demo", target_name="generator", relative_file_path="f.txt"),
-            Address("demo", target_name="generator"),
-            Address("demo", target_name="not-generator"),
-            Address("demo", target_name="secondary"),
-        },
+        expected=frozenset(
+            {
+                DEMO_GENERATED_F,
+                DEMO_GENERATOR,
+                DEMO_NOT_GENERATOR,
+                DEMO_SECONDARY,
+            }
+        ),
     )
 
 
+OWNERS_MULTIPLE_OWNERS_BUILD = dedent(
+    """\
+    target(name='not-generator-all', sources=['*.txt'])
+    target(name='not-generator-f2', sources=['f2.txt'])
+    generator(name='generator-all', sources=['*.txt'])
+    generator(name='generator-f2', sources=['f2.txt'])
+    secondary_owner(name='secondary', secondary_owner_field='f1.txt')
+    """
+)
+
+
 def test_owners_multiple_owners(owners_rule_runner: RuleRunner) -> None:
-    owners_rule_runner.write_files(
-        {
-            "demo/f1.txt": "",
-            "demo/f2.txt": "",
-            "demo/BUILD": dedent(
-                """\
-                target(name='not-generator-all', sources=['*.txt'])
-                target(name='not-generator-f2', sources=['f2.txt'])
-                generator(name='generator-all', sources=['*.txt'])
-                generator(name='generator-f2', sources=['f2.txt'])
-                secondary_owner(name='secondary', secondary_owner_field='f1.txt')
-                """
-            ),
-        }
-    )
+    owners_rule_runner.write_files({**DEMO_FILES, "demo/BUILD": OWNERS_MULTIPLE_OWNERS_BUILD})
     assert_owners(
         owners_rule_runner,
         ["demo/f1.txt"],
-        expected={
-            Address("demo", target_name="generator-all", relative_file_path="f1.txt"),
-            Address("demo", target_name="not-generator-all"),
-            Address("demo", target_name="secondary"),
-        },
+        expected=frozenset(
+            {
+                Address("demo", target_name="generator-all", relative_file_path="f1.txt"),
+                Address("demo", target_name="not-generator-all"),
+                DEMO_SECONDARY,
+            }
+        ),
     )
     assert_owners(
         owners_rule_runner,
         ["demo/f2.txt"],
-        expected={
-            Address("demo", target_name="generator-all", relative_file_path="f2.txt"),
-            Address("demo", target_name="not-generator-all"),
-            Address("demo", target_name="generator-f2", relative_file_path="f2.txt"),
-            Address("demo", target_name="not-generator-f2"),
-        },
+        expected=frozenset(
+            {
+                Address("demo", target_name="generator-all", relative_file_path="f2.txt"),
+                Address("demo", target_name="not-generator-all"),
+                Address("demo", target_name="generator-f2", relative_file_path="f2.txt"),
+                Address("demo", target_name="not-generator-f2"),
+            }
+        ),
     )
 
 
+OWNERS_BUILD_FILE_BUILD = dedent(
+    """\
+    target(name='f1', sources=['f1.txt'])
+    target(name='f2_first', sources=['f2.txt'])
+    target(name='f2_second', sources=['f2.txt'])
+    generator(name='generated', sources=['*.txt'])
+    secondary_owner(name='secondary', secondary_owner_field='f1.txt')
+    """
+)
+
+
 def test_owners_build_file(owners_rule_runner: RuleRunner) -> None:
     """A BUILD file owns every target defined in it."""
-    owners_rule_runner.write_files(
-        {
-            "demo/f1.txt": "",
-            "demo/f2.txt": "",
-            "demo/BUILD": dedent(
-                """\
-                target(name='f1', sources=['f1.txt'])
-                target(name='f2_first', sources=['f2.txt'])
-                target(name='f2_second', sources=['f2.txt'])
-                generator(name='generated', sources=['*.txt'])
-                secondary_owner(name='secondary', secondary_owner_field='f1.txt')
-                """
-            ),
-        }
-    )
+    owners_rule_runner.write_files({**DEMO_FILES, "demo/BUILD": OWNERS_BUILD_FILE_BUILD})
     assert_owners(
         owners_rule_runner,
         ["demo/BUILD"],
-        expected={
-            Address("demo", target_name="f1"),
-            Address("demo", target_name="f2_first"),
-            Address("demo", target_name="f2_second"),
-            Address("demo", target_name="secondary"),
-            Address("demo", target_name="generated", relative_file_path="f1.txt"),
-            Address("demo", target_name="generated", relative_file_path="f2.txt"),
-        },
+        expected=frozenset(
+            {
+                Address("demo", target_name="f1"),
+                Address("demo", target_name="f2_first"),
+                Address("demo", target_name="f2_second"),
+                DEMO_SECONDARY,
+                Address("demo", target_name="generated", relative_file_path="f1.txt"),
+                Address("demo", target_name="generated", relative_file_path="f2.txt"),
+            }
+        ),
     )
 
 
-@pytest.fixture
-def specs_rule_runner() -> RuleRunner:
+@pytest.fixture(scope="module")
+def _specs_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             generate_mock_generated_target,
             UnionRule(GenerateTargetsRequest, MockGenerateTargetsRequest),
             QueryRule(Addresses, [FilesystemSpecs]),
             QueryRule(Addresses, [Specs]),
+            QueryRule(SpecsSnapshot, [Specs]),
         ],
         target_types=[MockTarget, MockTargetGenerator, MockGeneratedTarget],
     )
 
 
+@pytest.fixture
+def specs_rule_runner(_specs_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_specs_rule_runner)
+
+
 def resolve_filesystem_specs(
     rule_runner: RuleRunner,
     specs: Iterable[FilesystemSpec],
@@ -758,63 +787,46 @@ def resolve_filesystem_specs(
     return sorted(result)
 
 
-def test_filesystem_specs_literal_file(specs_rule_runner: RuleRunner) -> None:
-    specs_rule_runner.write_files(
-        {
-            "demo/f1.txt": "",
-            "demo/f2.txt": "",
-            "demo/BUILD": dedent(
-                """\
-                generator(name='generator', sources=['*.txt'])
-                target(name='not-generator', sources=['*.txt'])
-                """
-            ),
-        }
-    )
-    assert resolve_filesystem_specs(specs_rule_runner, [FilesystemLiteralSpec("demo/f1.txt")]) == [
-        Address("demo", target_name="not-generator"),
-        Address("demo", target_name="generator", relative_file_path="f1.txt"),
-    ]
-
+FILESYSTEM_SPECS_BUILD = dedent(
+    """\
+    generator(name='generator', sources=['*.txt'])
+    target(name='not-generator', sources=['*.txt'])
+    """
+)
 
-def test_filesystem_specs_glob(specs_rule_runner: RuleRunner) -> None:
-    specs_rule_runner.write_files(
-        {
-            "demo/f1.txt": "",
-            "demo/f2.txt": "",
-            "demo/BUILD": dedent(
-                """\
-                generator(name='generator', sources=['*.txt'])
-                target(name='not-generator', sources=['*.txt'])
-                """
-            ),
-        }
-    )
-    all_addresses = [
-        Address("demo", target_name="not-generator"),
-        Address("demo", target_name="generator", relative_file_path="f1.txt"),
-        Address("demo", target_name="generator", relative_file_path="f2.txt"),
-    ]
 
-    assert (
-        resolve_filesystem_specs(specs_rule_runner, [FilesystemGlobSpec("demo/*.txt")])
-        == all_addresses
-    )
-    # We should deduplicate between glob and literal specs.
-    assert (
-        resolve_filesystem_specs(
-            specs_rule_runner,
+@pytest.mark.parametrize(
+    "specs,expected",
+    [
+        ([FilesystemLiteralSpec("demo/f1.txt")], [DEMO_NOT_GENERATOR, DEMO_GENERATED_F1]),
+        (
+            [FilesystemGlobSpec("demo/*.txt")],
+            [DEMO_NOT_GENERATOR, DEMO_GENERATED_F1, DEMO_GENERATED_F2],
+        ),
+        # We should deduplicate between glob and literal specs.
+        (
             [FilesystemGlobSpec("demo/*.txt"), FilesystemLiteralSpec("demo/f1.txt")],
-        )
-        == all_addresses
-    )
+            [DEMO_NOT_GENERATOR, DEMO_GENERATED_F1, DEMO_GENERATED_F2],
+        ),
+    ],
+)
+def test_filesystem_specs(
+    specs_rule_runner: RuleRunner, specs: List[FilesystemSpec], expected: List[Address]
+) -> None:
+    specs_rule_runner.write_files({**DEMO_FILES, "demo/BUILD": FILESYSTEM_SPECS_BUILD})
+    assert resolve_filesystem_specs(specs_rule_runner, specs) == expected
+
+
+UNMATCHED_GLOB_ERROR = re.compile(re.escape('Unmatched glob from file arguments: "demo/fake.txt"'))
+NO_OWNERS_ERROR = re.compile(
+    re.escape("No owning targets could be found for the file `no_owners/f.txt`")
+)
 
 
 def test_filesystem_specs_nonexistent_file(specs_rule_runner: RuleRunner) -> None:
     spec = FilesystemLiteralSpec("demo/fake.txt")
-    with pytest.raises(ExecutionError) as exc:
+    with pytest.raises(ExecutionError, match=UNMATCHED_GLOB_ERROR):
         resolve_filesystem_specs(specs_rule_runner, [spec])
-    assert 'Unmatched glob from file arguments: "demo/fake.txt"' in str(exc.value)
 
     specs_rule_runner.set_options(["--owners-not-found-behavior=ignore"])
     assert not resolve_filesystem_specs(specs_rule_runner, [spec])
@@ -823,9 +835,8 @@ def test_filesystem_specs_nonexistent_file(specs_rule_runner: RuleRunner) -> Non
 def test_filesystem_specs_no_owner(specs_rule_runner: RuleRunner) -> None:
     specs_rule_runner.write_files({"no_owners/f.txt": ""})
     # Error for literal specs.
-    with pytest.raises(ExecutionError) as exc:
+    with pytest.raises(ExecutionError, match=NO_OWNERS_ERROR):
         resolve_filesystem_specs(specs_rule_runner, [FilesystemLiteralSpec("no_owners/f.txt")])
-    assert "No owning targets could be found for the file `no_owners/f.txt`" in str(exc.value)
 
     # Do not error for glob specs.
     assert not resolve_filesystem_specs(specs_rule_runner, [FilesystemGlobSpec("no_owners/*.txt")])
@@ -847,7 +858,7 @@ def test_resolve_addresses_from_specs(specs_rule_runner: RuleRunner) -> None:
 
     no_interaction_specs = ["fs_spec/f.txt", "address_spec:address_spec"]
     multiple_files_specs = ["multiple_files/f2.txt", "multiple_files:multiple_files"]
-    specs = SpecsParser(specs_rule_runner.build_root).parse_specs(
+    specs = specs_parser(specs_rule_runner.build_root).parse_specs(
         [*no_interaction_specs, *multiple_files_specs]
     )
 
@@ -870,15 +881,26 @@ class FortranSources(Sources):
     pass
 
 
-def test_find_valid_field_sets(caplog) -> None:
-    class FortranTarget(Target):
-        alias = "fortran_target"
-        core_fields = (FortranSources, Tags)
+class FortranTarget(Target):
+    alias = "fortran_target"
+    core_fields = (FortranSources, Tags)
+
+
+class InvalidTarget(Target):
+    alias = "invalid_target"
+    core_fields = ()
 
-    class InvalidTarget(Target):
-        alias = "invalid_target"
-        core_fields = ()
 
+FIELD_SETS_BUILD = dedent(
+    """\
+    fortran_target(name="valid")
+    fortran_target(name="valid2")
+    invalid_target(name="invalid")
+    """
+)
+
+
+def test_find_valid_field_sets(caplog) -> None:
     @union
     class FieldSetSuperclass(FieldSet):
         pass
@@ -904,17 +926,7 @@ def test_find_valid_field_sets(caplog) -> None:
         target_types=[FortranTarget, InvalidTarget],
     )
 
-    rule_runner.write_files(
-        {
-            "BUILD": dedent(
-                """\
-                fortran_target(name="valid")
-                fortran_target(name="valid2")
-                invalid_target(name="invalid")
-                """
-            )
-        }
-    )
+    rule_runner.write_files({"BUILD": FIELD_SETS_BUILD})
     valid_tgt = FortranTarget({}, Address("", target_name="valid"))
     valid_spec = AddressLiteralSpec("", "valid")
     invalid_spec = AddressLiteralSpec("", "invalid")
@@ -978,19 +990,23 @@ def test_find_valid_field_sets(caplog) -> None:
     assert "No applicable files or targets matched." in caplog.text
 
 
-def test_no_applicable_targets_exception() -> None:
-    # Check that we correctly render the error message.
-    class Tgt1(Target):
-        alias = "tgt1"
-        core_fields = ()
+class Tgt1(Target):
+    alias = "tgt1"
+    core_fields = ()
+
+
+class Tgt2(Target):
+    alias = "tgt2"
+    core_fields = (Sources,)
+
 
-    class Tgt2(Target):
-        alias = "tgt2"
-        core_fields = (Sources,)
+class Tgt3(Target):
+    alias = "tgt3"
+    core_fields = ()
 
-    class Tgt3(Target):
-        alias = "tgt3"
-        core_fields = ()
+
+def test_no_applicable_targets_exception() -> None:
+    # Check that we correctly render the error message.
 
     # No targets/files specified. Because none of the relevant targets have a sources field, we do
     # not give the filedeps command.
@@ -1075,8 +1091,8 @@ def test_no_applicable_targets_exception() -> None:
 # -----------------------------------------------------------------------------------------------
 
 
-@pytest.fixture
-def sources_rule_runner() -> RuleRunner:
+@pytest.fixture(scope="module")
+def _sources_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             QueryRule(HydratedSources, [HydrateSourcesRequest]),
@@ -1085,10 +1101,20 @@ def sources_rule_runner() -> RuleRunner:
     )
 
 
+@pytest.fixture
+def sources_rule_runner(_sources_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_sources_rule_runner)
+
+
 def test_sources_normal_hydration(sources_rule_runner: RuleRunner) -> None:
     addr = Address("src/fortran", target_name="lib")
-    sources_rule_runner.create_files(
-        "src/fortran", files=["f1.f95", "f2.f95", "f1.f03", "ignored.f03"]
+    sources_rule_runner.write_files(
+        {
+            "src/fortran/f1.f95": "",
+            "src/fortran/f2.f95": "",
+            "src/fortran/f1.f03": "",
+            "src/fortran/ignored.f03": "",
+        }
     )
     sources = Sources(["f1.f95", "*.f03", "!ignored.f03", "!**/ignore*"], addr)
     hydrated_sources = sources_rule_runner.request(
@@ -1116,7 +1142,7 @@ def test_sources_output_type(sources_rule_runner: RuleRunner) -> None:
         pass
 
     addr = Address("", target_name="lib")
-    sources_rule_runner.create_files("", files=["f1.f95"])
+    sources_rule_runner.write_files({"f1.f95": ""})
 
     valid_sources = SourcesSubclass(["*"], addr)
     hydrated_valid_sources = sources_rule_runner.request(
@@ -1137,7 +1163,7 @@ def test_sources_output_type(sources_rule_runner: RuleRunner) -> None:
 
 def test_sources_unmatched_globs(sources_rule_runner: RuleRunner) -> None:
     sources_rule_runner.set_options(["--files-not-found-behavior=error"])
-    sources_rule_runner.create_files("", files=["f1.f95"])
+    sources_rule_runner.write_files({"f1.f95": ""})
     sources = Sources(["non_existent.f95"], Address("", target_name="lib"))
     with pytest.raises(ExecutionError) as exc:
         sources_rule_runner.request(HydratedSources, [HydrateSourcesRequest(sources)])
@@ -1154,7 +1180,9 @@ def test_sources_default_globs(sources_rule_runner: RuleRunner) -> None:
     # NB: Not all globs will be matched with these files, specifically `default.f03` will not
     # be matched. This is intentional to ensure that we use `any` glob conjunction rather
     # than the normal `all` conjunction.
-    sources_rule_runner.create_files("src/fortran", files=["default.f95", "f1.f08", "ignored.f08"])
+    sources_rule_runner.write_files(
+        {"src/fortran/default.f95": "", "src/fortran/f1.f08": "", "src/fortran/ignored.f08": ""}
+    )
     sources = DefaultSources(None, addr)
     assert set(sources.value or ()) == set(DefaultSources.default)
 
@@ -1169,7 +1197,14 @@ def test_sources_expected_file_extensions(sources_rule_runner: RuleRunner) -> No
         expected_file_extensions = (".f95", ".f03", "")
 
     addr = Address("src/fortran", target_name="lib")
-    sources_rule_runner.create_files("src/fortran", ["s.f95", "s.f03", "s.f08", "s"])
+    sources_rule_runner.write_files(
+        {
+            "src/fortran/s.f95": "",
+            "src/fortran/s.f03": "",
+            "src/fortran/s.f08": "",
+            "src/fortran/s": "",
+        }
+    )
 
     def get_sources(srcs: Iterable[str]) -> Tuple[str, ...]:
         return sources_rule_runner.request(
@@ -1194,7 +1229,7 @@ def test_sources_expected_num_files(sources_rule_runner: RuleRunner) -> None:
         # We allow for 1 or 3 files
         expected_num_files = range(1, 4, 2)
 
-    sources_rule_runner.create_files("", files=["f1.txt", "f2.txt", "f3.txt", "f4.txt"])
+    sources_rule_runner.write_files({"f1.txt": "", "f2.txt": "", "f3.txt": "", "f4.txt": ""})
 
     def hydrate(sources_cls: Type[Sources], sources: Iterable[str]) -> HydratedSources:
         return sources_rule_runner.request(
@@ -1252,19 +1287,21 @@ async def generate_smalltalk_from_avro(
 
     # Many codegen implementations will need to look up a protocol target's dependencies in their
     # rule. We add this here to ensure that this does not result in rule graph issues.
-    _ = await Get(TransitiveTargets, TransitiveTargetsRequest([request.protocol_target.address]))
+    _ = await Get(TransitiveTargets, TransitiveTargetsRequest((request.protocol_target.address,)))
 
     def generate_fortran(fp: str) -> FileContent:
-        parent = str(PurePath(fp).parent).replace("src/avro", "src/smalltalk")
-        file_name = f"{PurePath(fp).stem}.st"
-        return FileContent(str(PurePath(parent, file_name)), b"Generated")
+        parent, file_name = os.path.split(fp)
+        stem = os.path.splitext(file_name)[0]
+        return FileContent(
+            os.path.join(parent.replace("src/avro", "src/smalltalk"), f"{stem}.st"), b"Generated"
+        )
 
     result = await Get(Snapshot, CreateDigest([generate_fortran(fp) for fp in protocol_files]))
     return GeneratedSources(result)
 
 
-@pytest.fixture
-def codegen_rule_runner() -> RuleRunner:
+@pytest.fixture(scope="module")
+def _codegen_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             generate_smalltalk_from_avro,
@@ -1276,6 +1313,11 @@ def codegen_rule_runner() -> RuleRunner:
     )
 
 
+@pytest.fixture
+def codegen_rule_runner(_codegen_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_codegen_rule_runner)
+
+
 def setup_codegen_protocol_tgt(rule_runner: RuleRunner) -> Address:
     rule_runner.write_files(
         {"src/avro/f.avro": "", "src/avro/BUILD": "avro_library(name='lib', sources=['*.avro'])"}
@@ -1405,19 +1447,22 @@ def test_ambiguous_codegen_implementations_exception() -> None:
 # -----------------------------------------------------------------------------------------------
 
 
-def test_transitive_excludes_error() -> None:
-    class Valid1(Target):
-        alias = "valid1"
-        core_fields = (MockDependencies,)
+class Valid1(Target):
+    alias = "valid1"
+    core_fields = (MockDependencies,)
+
 
-    class Valid2(Target):
-        alias = "valid2"
-        core_fields = (MockDependencies,)
+class Valid2(Target):
+    alias = "valid2"
+    core_fields = (MockDependencies,)
 
-    class Invalid(Target):
-        alias = "invalid"
-        core_fields = (Dependencies,)
 
+class Invalid(Target):
+    alias = "invalid"
+    core_fields = (Dependencies,)
+
+
+def test_transitive_excludes_error() -> None:
     exc = TransitiveExcludesNotSupportedError(
         bad_value="!!//:bad",
         address=Address("demo"),
@@ -1470,17 +1515,23 @@ class InferSmalltalkDependencies(InferDependenciesRequest):
     infer_from = SmalltalkSources
 
 
+@memoized
+def parse_address_input(spec: str) -> AddressInput:
+    return AddressInput.parse(spec)
+
+
 @rule
 async def infer_smalltalk_dependencies(request: InferSmalltalkDependencies) -> InferredDependencies:
     # To demo an inference rule, we simply treat each `sources` file to contain a list of
     # addresses, one per line.
     hydrated_sources = await Get(HydratedSources, HydrateSourcesRequest(request.sources_field))
     digest_contents = await Get(DigestContents, Digest, hydrated_sources.snapshot.digest)
-    all_lines = itertools.chain.from_iterable(
-        file_content.content.decode().splitlines() for file_content in digest_contents
-    )
+    # Decode all of the files at once. Joining them may introduce blank lines, which we skip.
+    all_content = b"\n".join(file_content.content for file_content in digest_contents).decode()
     resolved = await MultiGet(
-        Get(Address, AddressInput, AddressInput.parse(line)) for line in all_lines
+        Get(Address, AddressInput, parse_address_input(line))
+        for line in dict.fromkeys(all_content.splitlines())
+        if line
     )
     # NB: See `test_depends_on_subtargets` for why we set the field
     # `sibling_dependencies_inferrable` this way.
@@ -1499,8 +1550,8 @@ async def generate_targets_from_smalltalk_library(
     return generate_file_level_targets(SmalltalkLibrary, request.generator, paths.files, None)
 
 
-@pytest.fixture
-def dependencies_rule_runner() -> RuleRunner:
+@pytest.fixture(scope="module")
+def _dependencies_rule_runner() -> RuleRunner:
     return RuleRunner(
         rules=[
             inject_smalltalk_deps,
@@ -1509,15 +1560,21 @@ def dependencies_rule_runner() -> RuleRunner:
             generate_targets_from_smalltalk_library,
             QueryRule(Addresses, [DependenciesRequest]),
             QueryRule(ExplicitlyProvidedDependencies, [DependenciesRequest]),
+            QueryRule(Addresses, [UnparsedAddressInputs]),
             UnionRule(InjectDependenciesRequest, InjectSmalltalkDependencies),
             UnionRule(InjectDependenciesRequest, InjectCustomSmalltalkDependencies),
             UnionRule(InferDependenciesRequest, InferSmalltalkDependencies),
             UnionRule(GenerateTargetsRequest, GenerateTargetsFromSmallTalkLibraryRequest),
         ],
-        target_types=[SmalltalkLibrary],
+        target_types=[SmalltalkLibrary, MockTarget],
     )
 
 
+@pytest.fixture
+def dependencies_rule_runner(_dependencies_rule_runner: RuleRunner) -> RuleRunner:
+    return reset_rule_runner(_dependencies_rule_runner)
+
+
 def assert_dependencies_resolved(
     rule_runner: RuleRunner,
     requested_address: Address,
@@ -1526,7 +1583,22 @@ def assert_dependencies_resolved(
 ) -> None:
     target = rule_runner.get_target(requested_address)
     result = rule_runner.request(Addresses, [DependenciesRequest(target[Dependencies])])
-    assert sorted(result) == sorted(expected)
+    assert Counter(result) == Counter(expected)
+
+
+EXPLICITLY_PROVIDED_DEPENDENCIES_BUILD = dedent(
+    """\
+    smalltalk(
+        dependencies=[
+            'a/b/c',
+            '!a/b/c',
+            'files/f.txt',
+            '!files/f.txt',
+            '!!files/transitive_exclude.txt',
+        ],
+    )
+    """
+)
 
 
 def test_explicitly_provided_dependencies(dependencies_rule_runner: RuleRunner) -> None:
@@ -1540,19 +1612,7 @@ def test_explicitly_provided_dependencies(dependencies_rule_runner: RuleRunner)
             "files/transitive_exclude.txt": "",
             "files/BUILD": "smalltalk(sources=['*.txt'])",
             "a/b/c/BUILD": "smalltalk()",
-            "demo/subdir/BUILD": dedent(
-                """\
-                smalltalk(
-                    dependencies=[
-                        'a/b/c',
-                        '!a/b/c',
-                        'files/f.txt',
-                        '!files/f.txt',
-                        '!!files/transitive_exclude.txt',
-                    ],
-                )
-                """
-            ),
+            "demo/subdir/BUILD": EXPLICITLY_PROVIDED_DEPENDENCIES_BUILD,
         }
     )
     target = dependencies_rule_runner.get_target(Address("demo/subdir"))
@@ -1592,6 +1652,22 @@ def test_normal_resolution(dependencies_rule_runner: RuleRunner) -> None:
     assert_dependencies_resolved(dependencies_rule_runner, Address("ignore"), expected=[])
 
 
+EXPLICIT_FILE_DEPENDENCIES_BUILD = dedent(
+    """\
+    smalltalk(
+      dependencies=[
+        './util/f1.st',
+        'src/smalltalk/util/f2.st',
+        './util/f3.st',
+        './util/f4.st',
+        '!./util/f3.st',
+        '!!./util/f4.st',
+      ]
+    )
+    """
+)
+
+
 def test_explicit_file_dependencies(dependencies_rule_runner: RuleRunner) -> None:
     dependencies_rule_runner.write_files(
         {
@@ -1600,20 +1676,7 @@ def test_explicit_file_dependencies(dependencies_rule_runner: RuleRunner) -> Non
             "src/smalltalk/util/f3.st": "",
             "src/smalltalk/util/f4.st": "",
             "src/smalltalk/util/BUILD": "smalltalk(sources=['*.st'])",
-            "src/smalltalk/BUILD": dedent(
-                """\
-                smalltalk(
-                  dependencies=[
-                    './util/f1.st',
-                    'src/smalltalk/util/f2.st',
-                    './util/f3.st',
-                    './util/f4.st',
-                    '!./util/f3.st',
-                    '!!./util/f4.st',
-                  ]
-                )
-                """
-            ),
+            "src/smalltalk/BUILD": EXPLICIT_FILE_DEPENDENCIES_BUILD,
         }
     )
     assert_dependencies_resolved(
@@ -1648,102 +1711,117 @@ def test_dependency_injection(dependencies_rule_runner: RuleRunner) -> None:
     )
 
 
-def test_dependency_inference(dependencies_rule_runner: RuleRunner) -> None:
-    """We test that dependency inference works generally and that we merge it correctly with
-    explicitly provided dependencies.
+# Addresses shared by several of the expectations in `test_dependency_inference`.
+INFERRED1 = Address("", target_name="inferred1")
+INFERRED2_FILE = Address("", relative_file_path="inferred2.st", target_name="inferred2")
+INFERRED_AND_PROVIDED1 = Address("", target_name="inferred_and_provided1")
+INFERRED_AND_PROVIDED2 = Address("", target_name="inferred_and_provided2")
+INFERRED_AND_PROVIDED2_FILE = Address(
+    "", relative_file_path="inferred_and_provided2.st", target_name="inferred_and_provided2"
+)
 
-    For consistency, dep inference does not merge generated subtargets with BUILD targets: if both
-    are inferred, expansion to Targets will remove the redundancy while converting to subtargets.
+DEPENDENCY_INFERENCE_BUILD = dedent(
+    """\
+    smalltalk(name='inferred1')
+    smalltalk(name='inferred2')
+    smalltalk(name='inferred_but_ignored1', sources=['inferred_but_ignored1.st'])
+    smalltalk(name='inferred_but_ignored2', sources=['inferred_but_ignored2.st'])
+    smalltalk(name='inferred_and_provided1')
+    smalltalk(name='inferred_and_provided2')
     """
-    dependencies_rule_runner.write_files(
-        {
-            "inferred1.st": "",
-            "inferred2.st": "",
-            "inferred_but_ignored1.st": "",
-            "inferred_but_ignored2.st": "",
-            "inferred_and_provided1.st": "",
-            "inferred_and_provided2.st": "",
-            "BUILD": dedent(
-                """\
-                smalltalk(name='inferred1')
-                smalltalk(name='inferred2')
-                smalltalk(name='inferred_but_ignored1', sources=['inferred_but_ignored1.st'])
-                smalltalk(name='inferred_but_ignored2', sources=['inferred_but_ignored2.st'])
-                smalltalk(name='inferred_and_provided1')
-                smalltalk(name='inferred_and_provided2')
-                """
-            ),
-            "demo/f1.st": dedent(
-                """\
-                //:inferred1
-                inferred2.st:inferred2
-                """
-            ),
-            "demo/f2.st": dedent(
-                """\
-                //:inferred_and_provided1
-                inferred_and_provided2.st:inferred_and_provided2
-                inferred_but_ignored1.st:inferred_but_ignored1
-                //:inferred_but_ignored2
-                """
-            ),
-            "demo/BUILD": dedent(
-                """\
-                smalltalk(
-                  sources=['*.st'],
-                  dependencies=[
-                    '//:inferred_and_provided1',
-                    '//:inferred_and_provided2',
-                    '!inferred_but_ignored1.st:inferred_but_ignored1',
-                    '!//:inferred_but_ignored2',
-                  ],
-                )
-                """
-            ),
-        }
-    )
+)
 
-    assert_dependencies_resolved(
-        dependencies_rule_runner,
-        Address("demo"),
-        expected=[
-            Address("", target_name="inferred1"),
-            Address("", relative_file_path="inferred2.st", target_name="inferred2"),
-            Address("", target_name="inferred_and_provided1"),
-            Address("", target_name="inferred_and_provided2"),
-            Address(
-                "",
-                relative_file_path="inferred_and_provided2.st",
-                target_name="inferred_and_provided2",
-            ),
-            Address("demo", relative_file_path="f1.st"),
-            Address("demo", relative_file_path="f2.st"),
-        ],
-    )
+DEPENDENCY_INFERENCE_F1 = dedent(
+    """\
+    //:inferred1
+    inferred2.st:inferred2
+    """
+)
 
-    assert_dependencies_resolved(
-        dependencies_rule_runner,
-        Address("demo", relative_file_path="f1.st", target_name="demo"),
-        expected=[
-            Address("", target_name="inferred1"),
-            Address("", relative_file_path="inferred2.st", target_name="inferred2"),
-            Address("", target_name="inferred_and_provided1"),
-            Address("", target_name="inferred_and_provided2"),
-        ],
+DEPENDENCY_INFERENCE_F2 = dedent(
+    """\
+    //:inferred_and_provided1
+    inferred_and_provided2.st:inferred_and_provided2
+    inferred_but_ignored1.st:inferred_but_ignored1
+    //:inferred_but_ignored2
+    """
+)
+
+DEPENDENCY_INFERENCE_DEMO_BUILD = dedent(
+    """\
+    smalltalk(
+      sources=['*.st'],
+      dependencies=[
+        '//:inferred_and_provided1',
+        '//:inferred_and_provided2',
+        '!inferred_but_ignored1.st:inferred_but_ignored1',
+        '!//:inferred_but_ignored2',
+      ],
     )
+    """
+)
+
+DEPENDENCY_INFERENCE_FILES: Mapping[Union[str, PurePath], str] = {
+    "inferred1.st": "",
+    "inferred2.st": "",
+    "inferred_but_ignored1.st": "",
+    "inferred_but_ignored2.st": "",
+    "inferred_and_provided1.st": "",
+    "inferred_and_provided2.st": "",
+    "BUILD": DEPENDENCY_INFERENCE_BUILD,
+    "demo/f1.st": DEPENDENCY_INFERENCE_F1,
+    "demo/f2.st": DEPENDENCY_INFERENCE_F2,
+    "demo/BUILD": DEPENDENCY_INFERENCE_DEMO_BUILD,
+}
+
+
+@pytest.fixture
+def dependency_inference_rule_runner(dependencies_rule_runner: RuleRunner) -> RuleRunner:
+    dependencies_rule_runner.write_files(DEPENDENCY_INFERENCE_FILES)
+    return dependencies_rule_runner
+
+
+@pytest.mark.parametrize(
+    "requested_address,expected",
+    [
+        pytest.param(
+            Address("demo"),
+            [
+                INFERRED1,
+                INFERRED2_FILE,
+                INFERRED_AND_PROVIDED1,
+                INFERRED_AND_PROVIDED2,
+                INFERRED_AND_PROVIDED2_FILE,
+                Address("demo", relative_file_path="f1.st"),
+                Address("demo", relative_file_path="f2.st"),
+            ],
+            id="generator",
+        ),
+        pytest.param(
+            Address("demo", relative_file_path="f1.st", target_name="demo"),
+            [INFERRED1, INFERRED2_FILE, INFERRED_AND_PROVIDED1, INFERRED_AND_PROVIDED2],
+            id="f1",
+        ),
+        pytest.param(
+            Address("demo", relative_file_path="f2.st", target_name="demo"),
+            [INFERRED_AND_PROVIDED1, INFERRED_AND_PROVIDED2, INFERRED_AND_PROVIDED2_FILE],
+            id="f2",
+        ),
+    ],
+)
+def test_dependency_inference(
+    dependency_inference_rule_runner: RuleRunner,
+    requested_address: Address,
+    expected: List[Address],
+) -> None:
+    """We test that dependency inference works generally and that we merge it correctly with
+    explicitly provided dependencies.
 
+    For consistency, dep inference does not merge generated subtargets with BUILD targets: if both
+    are inferred, expansion to Targets will remove the redundancy while converting to subtargets.
+    """
     assert_dependencies_resolved(
-        dependencies_rule_runner,
-        Address("demo", relative_file_path="f2.st", target_name="demo"),
-        expected=[
-            Address("", target_name="inferred_and_provided1"),
-            Address("", target_name="inferred_and_provided2"),
-            Address(
-                "",
-                relative_file_path="inferred_and_provided2.st",
-                target_name="inferred_and_provided2",
-            ),
-        ],
+        dependency_inference_rule_runner, requested_address, expected=expected
     )
 
 
@@ -1785,30 +1863,24 @@ def test_depends_on_generated_targets(dependencies_rule_runner: RuleRunner) -> N
     )
 
 
-def test_resolve_unparsed_address_inputs() -> None:
-    rule_runner = RuleRunner(
-        rules=[QueryRule(Addresses, [UnparsedAddressInputs])], target_types=[MockTarget]
-    )
-    rule_runner.write_files(
-        {
-            "project/BUILD": dedent(
-                """\
-                target(name="t1")
-                target(name="t2")
-                target(name="t3")
-                """
-            )
-        }
-    )
-    addresses = rule_runner.request(
-        Addresses,
-        [
-            UnparsedAddressInputs(
-                ["project:t1", ":t2"], owning_address=Address("project", target_name="t3")
-            )
-        ],
-    )
-    assert set(addresses) == {
-        Address("project", target_name="t1"),
-        Address("project", target_name="t2"),
-    }
+UNPARSED_ADDRESS_INPUTS_BUILD = dedent(
+    """\
+    target(name="t1")
+    target(name="t2")
+    target(name="t3")
+    """
+)
+
+UNPARSED_ADDRESS_INPUTS = UnparsedAddressInputs(
+    ("project:t1", ":t2"), owning_address=Address("project", target_name="t3")
+)
+
+UNPARSED_ADDRESS_INPUTS_EXPECTED = frozenset(
+    {Address("project", target_name="t1"), Address("project", target_name="t2")}
+)
+
+
+def test_resolve_unparsed_address_inputs(dependencies_rule_runner: RuleRunner) -> None:
+    dependencies_rule_runner.write_files({"project/BUILD": UNPARSED_ADDRESS_INPUTS_BUILD})
+    addresses = dependencies_rule_runner.request(Addresses, [UNPARSED_ADDRESS_INPUTS])
+    assert frozenset(addresses) == UNPARSED_ADDRESS_INPUTS_EXPECTED
@@ -3,12 +3,14 @@
 
 from __future__ import annotations
 
+import functools
 import os.path
 import threading
 import tokenize
 from dataclasses import dataclass
 from difflib import get_close_matches
 from io import StringIO
+from types import CodeType
 from typing import Any, Iterable
 
 from pants.base.exceptions import MappingError
@@ -129,7 +131,7 @@ class Parser:
             global_symbols[k] = v
 
         try:
-            exec(build_file_content, global_symbols)
+            exec(_compile_build_file(build_file_content), global_symbols)
         except NameError as e:
             valid_symbols = sorted(s for s in global_symbols.keys() if s != "__builtins__")
             original = e.args[0].capitalize()
@@ -157,6 +159,13 @@ class Parser:
         return self._parse_state.parsed_targets()
 
 
+# Many BUILD files have identical content (e.g. a bare `python_sources()`), so we reuse their
+# compiled code. The cache is bounded because BUILD files change over the life of pantsd.
+@functools.lru_cache(maxsize=1024)
+def _compile_build_file(build_file_content: str) -> CodeType:
+    return compile(build_file_content, "<string>", "exec")
+
+
 def error_on_imports(build_file_content: str, filepath: str) -> None:
     # This is poor sandboxing; there are many ways to get around this. But it's sufficient to tell
     # users who aren't malicious that they're doing something wrong, and it has a low performance
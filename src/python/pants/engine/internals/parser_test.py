@@ -7,6 +7,7 @@ import pytest
 
 from pants.build_graph.build_file_aliases import BuildFileAliases
 from pants.engine.internals.parser import BuildFilePreludeSymbols, ParseError, Parser
+from pants.engine.internals.target_adaptor import TargetAdaptor
 from pants.util.docutil import doc_url
 from pants.util.frozendict import FrozenDict
 
@@ -52,3 +53,31 @@ def test_unrecogonized_symbol() -> None:
     perform_test(test_targs[:2], dym_two)
     dym_many = "Did you mean fake5, fake4, or fake3?\n\n"
     perform_test(test_targs, dym_many)
+
+
+def test_identical_build_files() -> None:
+    """BUILD files with the same content share compiled code, but must still be parsed separately."""
+    parser = Parser(
+        build_root="",
+        target_type_aliases=["tgt"],
+        object_aliases=BuildFileAliases(
+            context_aware_object_factories={"here": lambda ctx: lambda: ctx.rel_path}
+        ),
+    )
+    prelude_symbols = BuildFilePreludeSymbols(FrozenDict())
+    content = "tgt()\ntgt(name='explicit', rel_path=here())\n"
+
+    assert parser.parse("a/BUILD", content, prelude_symbols) == [
+        TargetAdaptor("tgt", "a"),
+        TargetAdaptor("tgt", "explicit", rel_path="a"),
+    ]
+    assert parser.parse("b/c/BUILD", content, prelude_symbols) == [
+        TargetAdaptor("tgt", "c"),
+        TargetAdaptor("tgt", "explicit", rel_path="b/c"),
+    ]
+
+    # Errors raised when executing the shared code are still converted for each parse.
+    for filepath in ("a/BUILD", "b/BUILD"):
+        with pytest.raises(ParseError) as exc:
+            parser.parse(filepath, "fake()", prelude_symbols)
+        assert str(exc.value).startswith("Name 'fake' is not defined.")
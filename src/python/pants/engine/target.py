@@ -48,7 +48,7 @@ from pants.source.filespec import Filespec, matches_filespec
 from pants.util.collections import ensure_list, ensure_str_list
 from pants.util.docutil import doc_url
 from pants.util.frozendict import FrozenDict
-from pants.util.memo import memoized_classproperty, memoized_method, memoized_property
+from pants.util.memo import memoized, memoized_classproperty, memoized_method, memoized_property
 from pants.util.meta import frozen_after_init
 from pants.util.ordered_set import FrozenOrderedSet
 from pants.util.strutil import pluralize
@@ -800,19 +800,31 @@ def generate_file_level_targets(
 # -----------------------------------------------------------------------------------------------
 
 
+@memoized
+def _get_field_set_expected_fields(
+    field_set: Type[FieldSet],
+) -> Tuple[Tuple[str, Type[Field], bool], ...]:
+    """Return each field declared by the FieldSet, along with whether it is required.
+
+    Resolving type hints is slow, and the result never changes for a given FieldSet, so we compute
+    it once per FieldSet rather than every time a FieldSet is created.
+    """
+    required_fields = frozenset(field_set.required_fields)
+    return tuple(
+        (name, field_type, field_type in required_fields)
+        for name, field_type in get_type_hints(field_set).items()
+        if isinstance(field_type, type) and issubclass(field_type, Field)
+    )
+
+
 def _get_field_set_fields_from_target(
     field_set: Type[FieldSet], target: Target
 ) -> Dict[str, Field]:
-    all_expected_fields: Dict[str, Type[Field]] = {
-        name: field_type
-        for name, field_type in get_type_hints(field_set).items()
-        if isinstance(field_type, type) and issubclass(field_type, Field)
-    }
     return {
-        dataclass_field_name: (
-            target[field_cls] if field_cls in field_set.required_fields else target.get(field_cls)
+        dataclass_field_name: target[field_cls] if is_required else target.get(field_cls)
+        for dataclass_field_name, field_cls, is_required in _get_field_set_expected_fields(
+            field_set
         )
-        for dataclass_field_name, field_cls in all_expected_fields.items()
     }
 
 
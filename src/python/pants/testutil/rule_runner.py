@@ -324,8 +324,7 @@ class RuleRunner:
         path: The relative path to the file from the build root.
         files: List of file names.
         """
-        for f in files:
-            self.create_file(os.path.join(path, f), contents=f)
+        self.write_files({os.path.join(path, f): f for f in files})
 
     def add_to_build_file(
         self, relpath: str | PurePath, target: str, *, overwrite: bool = False
@@ -347,8 +346,14 @@ class RuleRunner:
 
         :API: public
         """
+        # Create each parent directory and invalidate all of the written paths only once, rather
+        # than once per file.
+        for dirname in {os.path.dirname(os.path.join(self.build_root, path)) for path in files}:
+            safe_mkdir(dirname)
         for path, content in files.items():
-            self.create_file(path, content)
+            with open(os.path.join(self.build_root, path), mode="w") as fp:
+                fp.write(content)
+        self._invalidate_for(*(str(path) for path in files))
 
     def make_snapshot(self, files: Mapping[str, str | bytes]) -> Snapshot:
         """Makes a snapshot from a map of file name to file content.